@@ -4,13 +4,40 @@ Lightweight E-commerce API for Deception Demo
 Provides fake endpoints that look like real e-commerce APIs
 """
 
+import asyncio
+import atexit
 import json
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
+import queue
+import re
+from http import HTTPStatus
 import logging
-
-logging.basicConfig(level=logging.INFO)
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:  # Stock python image: fall back to stdlib json
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+    json_loads = json.loads
+
+try:
+    import uvloop
+except ImportError:  # Stock python image: default asyncio event loop
+    uvloop = None
+
+# Log records are queued by the event loop and formatted/written by a
+# background listener thread, keeping stderr I/O off the hot path
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+log_listener = QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logging.root.setLevel(logging.INFO)
+logging.root.addHandler(QueueHandler(log_queue))
 logger = logging.getLogger("ecommerce-api")
 
 
@@ -29,80 +56,208 @@ USERS = {
     "test": "test123",
 }
 
+# Fake config leaked by /api/config (honeypot bait)
+FAKE_CONFIG = {
+    "db_host": "db.internal.local",
+    "db_user": "app_user",
+    "db_name": "ecommerce",
+    "api_key": "sk-fake-api-key-12345",
+}
 
-class APIHandler(BaseHTTPRequestHandler):
-    """Handle API requests"""
-
-    def log_message(self, format, *args):
-        logger.info(json.dumps({
-            "event": "request",
-            "client": self.client_address[0],
-            "method": self.command,
-            "path": self.path,
-        }))
-
-    def send_json(self, data, status=200):
-        """Send JSON response"""
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
-
-    def do_GET(self):
+# Static responses, serialized once at import
+PRODUCTS_JSON = json_dumps({"products": PRODUCTS})
+PRODUCT_BY_ID = {p["id"]: json_dumps(p) for p in PRODUCTS}
+HEALTH_JSON = json_dumps({"status": "healthy"})
+CONFIG_JSON = json_dumps(FAKE_CONFIG)
+
+# Request framing: the head ends at a blank line (CRLF or bare LF); most
+# bytes accepted and seconds allowed to receive the head and the body
+HEAD_END_RE = re.compile(rb"\r?\n\r?\n")
+MAX_HEAD_SIZE = 16 * 1024
+HEAD_TIMEOUT = 30.0
+MAX_BODY_SIZE = 16 * 1024
+BODY_TIMEOUT = 10.0
+
+# SQL injection markers for the search endpoint (shortest is "--")
+SQL_RE = re.compile(r"union|select|drop|delete|--|or 1=1", re.IGNORECASE)
+
+
+class APIServer:
+    """Asyncio e-commerce API server"""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8081):
+        self.host = host
+        self.port = port
+
+    async def start(self):
+        """Start the API server"""
+        server = await asyncio.start_server(
+            self.handle_connection,
+            self.host,
+            self.port,
+            limit=1024 * 64,  # 64KB read buffer, fewer recv syscalls
+        )
+        logger.info(f"Starting API server on port {self.port}")
+
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """Handle HTTP requests on a persistent (keep-alive) connection"""
+        client = writer.get_extra_info("peername")[0]
+        buf = bytearray()  # received bytes not yet consumed by a request
+
+        try:
+            while True:
+                head = await self.read_head(reader, buf)
+                request_line, *header_lines = head.decode("latin-1").split("\n")
+                method, path, version = request_line.rstrip("\r").split(" ", 2)
+
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                content_length = int(headers.get("content-length", 0))
+                if content_length > MAX_BODY_SIZE:
+                    writer.write(self.build_response(413, json_dumps({"error": "Payload too large"})))
+                    break
+                body = await self.read_body(reader, buf, content_length)
+
+                # HTTP/1.1 defaults to keep-alive, HTTP/1.0 must ask for it
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.1":
+                    keep_alive = connection != "close"
+                else:
+                    keep_alive = connection == "keep-alive"
+
+                logger.info(json_dumps({
+                    "event": "request",
+                    "client": client,
+                    "method": method,
+                    "path": path,
+                }).decode())
+
+                if method == "GET":
+                    status, payload = self.handle_get(path, client)
+                elif method == "POST":
+                    status, payload = self.handle_post(path, body, client)
+                else:
+                    status, payload = 501, json_dumps({"error": "Unsupported method"})
+
+                writer.write(self.build_response(status, payload, keep_alive))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        except ValueError:
+            writer.write(self.build_response(400, json_dumps({"error": "Bad request"})))
+        except Exception as e:
+            logger.error(json_dumps({"event": "error", "error": str(e)}).decode())
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def read_head(self, reader: asyncio.StreamReader, buf: bytearray) -> bytes:
+        """Take one request head off buf, reading until its blank line arrives
+
+        Bytes after the blank line stay in buf for the body and any pipelined
+        request. Raises TimeoutError after HEAD_TIMEOUT, IncompleteReadError
+        on EOF and ValueError past MAX_HEAD_SIZE.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + HEAD_TIMEOUT
+        start = 0
+        while True:
+            match = HEAD_END_RE.search(buf, start)
+            if match:
+                head = bytes(buf[:match.start()])
+                del buf[:match.end()]
+                return head
+            if len(buf) > MAX_HEAD_SIZE:
+                raise ValueError("request head too large")
+            # A terminator can straddle the old end by at most 3 bytes
+            start = max(len(buf) - 3, 0)
+            chunk = await asyncio.wait_for(reader.read(65536), timeout=deadline - loop.time())
+            if not chunk:
+                raise asyncio.IncompleteReadError(bytes(buf), None)
+            buf += chunk
+
+    async def read_body(self, reader: asyncio.StreamReader, buf: bytearray, length: int) -> bytes:
+        """Take a length-byte body off buf, reading within BODY_TIMEOUT"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + BODY_TIMEOUT
+        while len(buf) < length:
+            chunk = await asyncio.wait_for(reader.read(65536), timeout=deadline - loop.time())
+            if not chunk:
+                raise asyncio.IncompleteReadError(bytes(buf), length)
+            buf += chunk
+        body = bytes(buf[:length])
+        del buf[:length]
+        return body
+
+    def build_response(self, status: int, payload: bytes, keep_alive: bool = False) -> bytes:
+        """Build JSON HTTP response (headers and body in one buffer, one send)"""
+        header = (
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        return header.encode() + payload
+
+    def handle_get(self, path: str, client: str) -> tuple:
         """Handle GET requests"""
-        parsed = urlparse(self.path)
-        path = parsed.path
-        query = parse_qs(parsed.query)
+        path = path.partition("?")[0]
 
         if path == "/api/products":
-            self.send_json({"products": PRODUCTS})
+            return 200, PRODUCTS_JSON
 
         elif path.startswith("/api/products/"):
             try:
-                product_id = int(path.split("/")[-1])
-                product = next((p for p in PRODUCTS if p["id"] == product_id), None)
-                if product:
-                    self.send_json(product)
-                else:
-                    self.send_json({"error": "Product not found"}, 404)
+                product_id = int(path.rpartition("/")[2])
             except ValueError:
-                self.send_json({"error": "Invalid product ID"}, 400)
+                return 400, json_dumps({"error": "Invalid product ID"})
+            product = PRODUCT_BY_ID.get(product_id)
+            if product:
+                return 200, product
+            return 404, json_dumps({"error": "Product not found"})
 
         elif path == "/api/health":
-            self.send_json({"status": "healthy"})
+            return 200, HEALTH_JSON
 
         elif path == "/api/config":
             # Honeypot: Fake config endpoint
-            logger.warning(json.dumps({
+            logger.warning(json_dumps({
                 "event": "suspicious_access",
                 "path": path,
-                "client": self.client_address[0],
-            }))
-            self.send_json({
-                "db_host": "db.internal.local",
-                "db_user": "app_user",
-                "db_name": "ecommerce",
-                "api_key": "sk-fake-api-key-12345",
-            })
-
-        else:
-            self.send_json({"error": "Not found"}, 404)
-
-    def do_POST(self):
-        """Handle POST requests"""
-        parsed = urlparse(self.path)
-        path = parsed.path
+                "client": client,
+            }).decode())
+            return 200, CONFIG_JSON
+
+        return 404, json_dumps({"error": "Not found"})
 
-        content_length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(content_length).decode() if content_length else ""
+    def handle_post(self, path: str, body: bytes, client: str) -> tuple:
+        """Handle POST requests"""
+        path = path.partition("?")[0]
 
         if path == "/api/login":
             try:
-                data = json.loads(body) if body.startswith("{") else {}
+                data = json_loads(body) if body.startswith(b"{") else {}
                 # Parse form data
                 if not data and body:
-                    pairs = body.split("&")
+                    pairs = body.decode().split("&")
                     data = {}
                     for pair in pairs:
                         if "=" in pair:
@@ -112,55 +267,54 @@ class APIHandler(BaseHTTPRequestHandler):
                 username = data.get("username", "")
                 password = data.get("password", "")
 
-                logger.warning(json.dumps({
+                logger.warning(json_dumps({
                     "event": "login_attempt",
                     "username": username,
-                    "client": self.client_address[0],
-                }))
+                    "client": client,
+                }).decode())
 
                 # Always fail but log the attempt
-                self.send_json({"error": "Invalid credentials"}, 401)
+                return 401, json_dumps({"error": "Invalid credentials"})
 
             except Exception as e:
-                self.send_json({"error": str(e)}, 400)
+                return 400, json_dumps({"error": str(e)})
 
         elif path == "/api/search":
             # Honeypot: SQL injection detection point
             try:
-                data = json.loads(body) if body else {}
+                data = json_loads(body) if body else {}
                 query = data.get("q", "")
 
                 # Log search query (potential SQL injection)
-                logger.info(json.dumps({
+                logger.info(json_dumps({
                     "event": "search",
                     "query": query[:200],
-                    "client": self.client_address[0],
-                }))
+                    "client": client,
+                }).decode())
 
                 # Check for SQL injection patterns
-                sql_patterns = ["union", "select", "drop", "delete", "--", "or 1=1"]
-                if any(p in query.lower() for p in sql_patterns):
-                    logger.warning(json.dumps({
+                if len(query) >= 2 and SQL_RE.search(query):
+                    logger.warning(json_dumps({
                         "event": "sql_injection_attempt",
                         "query": query[:200],
-                        "client": self.client_address[0],
-                    }))
+                        "client": client,
+                    }).decode())
 
-                self.send_json({"results": []})
+                return 200, json_dumps({"results": []})
 
             except Exception as e:
-                self.send_json({"error": str(e)}, 400)
+                return 400, json_dumps({"error": str(e)})
 
-        else:
-            self.send_json({"error": "Not found"}, 404)
+        return 404, json_dumps({"error": "Not found"})
 
 
-def main():
+async def main():
     port = int(os.getenv("PORT", "8081"))
-    server = HTTPServer(("0.0.0.0", port), APIHandler)
-    logger.info(f"Starting API server on port {port}")
-    server.serve_forever()
+    server = APIServer(port=port)
+    await server.start()
 
 
 if __name__ == "__main__":
-    main()
+    if uvloop is not None:
+        uvloop.install()
+    asyncio.run(main())
@@ -5,23 +5,69 @@ Emulates MySQL/PostgreSQL protocols
 """
 
 import asyncio
-import hashlib
-import json
+import atexit
 import logging
 import os
+import queue
 import re
+import secrets
 import struct
 import time
-from dataclasses import dataclass, asdict
-from datetime import datetime
-from typing import List, Optional
+from collections import deque
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
+from typing import Deque, Optional
+
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # Optional: default asyncio event loop
+    uvloop = None
+
+try:
+    import hyperscan
+except ImportError:  # Optional: fall back to the stdlib regex scan
+    hyperscan = None
+
+try:
+    import re2 as regex_engine
+except ImportError:  # Optional: linear-time RE2, else the backtracking stdlib re
+    regex_engine = re
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-logging.basicConfig(level=getattr(logging, LOG_LEVEL))
+
+# Log records are queued by the event loop and formatted/written by a
+# background listener thread, keeping stderr I/O off the hot path
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+log_listener = QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logging.root.setLevel(getattr(logging, LOG_LEVEL))
+logging.root.addHandler(QueueHandler(log_queue))
 logger = logging.getLogger("db-honeypot")
 
 
-@dataclass
+# Event timestamps: the "YYYY-MM-DDTHH:MM:SS" part is formatted once per second
+_ts_second = -1
+_ts_prefix = ""
+
+
+def _iso_now() -> str:
+    """Current UTC time as ISO-8601 with microseconds"""
+    global _ts_second, _ts_prefix
+    now_us = time.time_ns() // 1000
+    second, micros = divmod(now_us, 1_000_000)
+    if second != _ts_second:
+        _ts_second = second
+        _ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+    return f"{_ts_prefix}.{micros:06d}"
+
+
+@dataclass(slots=True)
 class DBEvent:
     """Represents a database interaction event"""
     timestamp: str
@@ -36,7 +82,19 @@ class DBEvent:
     session_id: str = ""
 
     def to_json(self) -> str:
-        return json.dumps(asdict(self))
+        # Flat record: build the dict directly instead of asdict()'s deep copy
+        return orjson.dumps({
+            "timestamp": self.timestamp,
+            "event_type": self.event_type,
+            "source_ip": self.source_ip,
+            "source_port": self.source_port,
+            "protocol": self.protocol,
+            "username": self.username,
+            "database": self.database,
+            "query": self.query,
+            "is_injection": self.is_injection,
+            "session_id": self.session_id,
+        }).decode()
 
 
 # SQL injection detection patterns
@@ -59,6 +117,70 @@ SQL_INJECTION_PATTERNS = [
 ]
 
 
+def _on_injection_match(pattern_id, start, end, flags, context) -> bool:
+    """Hyperscan match callback: record the hit and stop scanning"""
+    context.append(pattern_id)
+    return True
+
+
+def _build_hyperscan_db():
+    """Multi-pattern DFA: single pass, no backtracking"""
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[p.encode() for p in SQL_INJECTION_PATTERNS],
+        ids=list(range(len(SQL_INJECTION_PATTERNS))),
+        elements=len(SQL_INJECTION_PATTERNS),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(SQL_INJECTION_PATTERNS),
+    )
+    return db
+
+
+# Injection matchers, compiled once at import and shared by all instances.
+# The alternation needs a single search per query.
+_INJECTION_RE = regex_engine.compile(
+    "(?i)" + "|".join(f"(?:{p})" for p in SQL_INJECTION_PATTERNS)
+)
+_HS_DB = _build_hyperscan_db() if hyperscan is not None else None
+
+
+def _build_empty_result() -> bytes:
+    """Build the (constant) MySQL empty result set"""
+    result = bytearray()
+
+    # Column count packet
+    col_count = b"\x01\x00\x00\x01\x01"  # 1 column
+    result.extend(col_count)
+
+    # Column definition (simplified)
+    col_def = bytearray()
+    col_def.extend(b"\x03def")  # catalog
+    col_def.append(0)  # schema
+    col_def.append(0)  # table
+    col_def.append(0)  # org_table
+    col_def.extend(b"\x06result")  # name
+    col_def.append(0)  # org_name
+    col_def.append(0x0c)  # length of fixed fields
+    col_def.extend(struct.pack("<H", 33))  # charset
+    col_def.extend(struct.pack("<I", 255))  # column length
+    col_def.append(0xfd)  # column type (varchar)
+    col_def.extend(struct.pack("<H", 0))  # flags
+    col_def.append(0)  # decimals
+    col_def.extend(b"\x00\x00")  # filler
+
+    col_header = struct.pack("<I", len(col_def))[:3] + b"\x02"
+    result.extend(col_header + bytes(col_def))
+
+    # EOF packet
+    eof = b"\x05\x00\x00\x03\xfe\x00\x00\x02\x00"
+    result.extend(eof)
+
+    # No rows - just EOF
+    eof2 = b"\x05\x00\x00\x04\xfe\x00\x00\x02\x00"
+    result.extend(eof2)
+
+    return bytes(result)
+
+
 class MySQLHoneypot:
     """MySQL Protocol Honeypot"""
 
@@ -66,21 +188,42 @@ class MySQLHoneypot:
     MYSQL_PROTOCOL_VERSION = 10
     MYSQL_SERVER_VERSION = b"5.7.38-0ubuntu0.18.04.1"
 
+    # Stream buffer / read size: larger reads return more packets per wakeup
+    RECV_SIZE = 1024 * 64
+    # Largest packet we buffer while waiting for the rest of it
+    MAX_PACKET_SIZE = 1024 * 1024
+
+    # Greeting packet: protocol version + null-terminated server version
+    GREETING_HEAD = struct.pack("<B", MYSQL_PROTOCOL_VERSION) + MYSQL_SERVER_VERSION + b"\x00"
+    # Filler, capability flags (lower), charset utf8, status flags,
+    # capability flags (upper), auth plugin data length, reserved
+    GREETING_CAPABILITIES = struct.pack("<BHBHHB10s", 0, 0xF7FF, 33, 0x0002, 0x0081, 21, b"\x00" * 10)
+    # Auth plugin data terminator + auth plugin name
+    GREETING_TAIL = b"\x00mysql_native_password\x00"
+
+    # OK packet (seq 2): header, affected rows, last insert id, status flags, warnings
+    OK_PACKET = struct.pack("<I", 7)[:3] + b"\x02" + struct.pack("<BBBHH", 0x00, 0, 0, 0x0002, 0)
+
+    # Empty result set has no query-dependent content
+    EMPTY_RESULT = _build_empty_result()
+
     def __init__(
         self,
         host: str = "0.0.0.0",
         port: int = 3306,
         max_connections: int = 25,
+        event_buffer: int = 4096,
     ):
         self.host = host
         self.port = port
         self.max_connections = max_connections
         self.active_connections = 0
-        self.events: List[DBEvent] = []
+        # Bounded: every event is already logged, keep only the most recent
+        self.events: Deque[DBEvent] = deque(maxlen=event_buffer)
         self.connection_id = 0
 
-        # Compile patterns
-        self.injection_patterns = [re.compile(p, re.IGNORECASE) for p in SQL_INJECTION_PATTERNS]
+        # Hyperscan scratch space is per instance; the database is shared
+        self.hs_scratch = hyperscan.Scratch(_HS_DB) if _HS_DB is not None else None
 
         # Metrics
         self.total_connections = 0
@@ -93,16 +236,16 @@ class MySQLHoneypot:
             self.handle_connection,
             self.host,
             self.port,
-            limit=1024 * 32,
+            limit=self.RECV_SIZE,
         )
 
         addr = server.sockets[0].getsockname()
-        logger.info(json.dumps({
+        logger.info(orjson.dumps({
             "event": "server_started",
             "protocol": "mysql",
             "host": addr[0],
             "port": addr[1],
-        }))
+        }).decode())
 
         async with server:
             await server.serve_forever()
@@ -122,14 +265,14 @@ class MySQLHoneypot:
         self.active_connections += 1
         self.total_connections += 1
         self.connection_id += 1
-        session_id = hashlib.sha256(f"{client_ip}:{client_port}:{time.time()}".encode()).hexdigest()[:16]
+        session_id = secrets.token_hex(8)
 
-        logger.info(json.dumps({
+        logger.info(orjson.dumps({
             "event": "connection_opened",
             "session_id": session_id,
             "source_ip": client_ip,
             "protocol": "mysql",
-        }))
+        }).decode())
 
         try:
             # Send greeting packet
@@ -142,15 +285,15 @@ class MySQLHoneypot:
             if auth_data:
                 username, database = self.parse_auth_packet(auth_data)
 
-                logger.info(json.dumps({
+                logger.info(orjson.dumps({
                     "event": "auth_attempt",
                     "session_id": session_id,
                     "username": username,
                     "database": database,
-                }))
+                }).decode())
 
                 event = DBEvent(
-                    timestamp=datetime.utcnow().isoformat(),
+                    timestamp=_iso_now(),
                     event_type="db_auth",
                     source_ip=client_ip,
                     source_port=client_port,
@@ -171,7 +314,7 @@ class MySQLHoneypot:
         except asyncio.TimeoutError:
             pass
         except Exception as e:
-            logger.error(json.dumps({"event": "error", "error": str(e)}))
+            logger.error(orjson.dumps({"event": "error", "error": str(e)}).decode())
         finally:
             self.active_connections -= 1
             writer.close()
@@ -189,114 +332,102 @@ class MySQLHoneypot:
         client_port: int,
     ):
         """Handle incoming SQL queries"""
+        buf = bytearray()
+
         while True:
             try:
-                data = await asyncio.wait_for(reader.read(4096), timeout=300.0)
+                data = await asyncio.wait_for(reader.read(self.RECV_SIZE), timeout=300.0)
                 if not data:
                     break
+                buf += data
+
+                # Consume every complete packet: 3-byte length + sequence id header
+                offset = 0
+                with memoryview(buf) as view:
+                    while len(buf) - offset >= 4:
+                        length = struct.unpack_from("<I", buf, offset)[0] & 0xFFFFFF
+                        end = offset + 4 + length
+                        if end > len(buf):
+                            break
+                        self.handle_query_packet(
+                            view[offset:end], writer, session_id, client_ip, client_port
+                        )
+                        offset = end
+                del buf[:offset]
+
+                # Incomplete packet larger than we are willing to buffer
+                if len(buf) >= 4 and struct.unpack_from("<I", buf)[0] & 0xFFFFFF > self.MAX_PACKET_SIZE:
+                    break
 
-                # Parse query
-                query = self.parse_query_packet(data)
-                if query:
-                    self.total_queries += 1
-                    is_injection = self.detect_injection(query)
-
-                    log_data = {
-                        "event": "sql_query",
-                        "session_id": session_id,
-                        "query": query[:200],
-                    }
-
-                    if is_injection:
-                        self.injections_detected += 1
-                        log_data["attack"] = "sql_injection"
-                        logger.warning(json.dumps(log_data))
-                    else:
-                        logger.info(json.dumps(log_data))
-
-                    event = DBEvent(
-                        timestamp=datetime.utcnow().isoformat(),
-                        event_type="sql_query",
-                        source_ip=client_ip,
-                        source_port=client_port,
-                        protocol="mysql",
-                        query=query,
-                        is_injection=is_injection,
-                        session_id=session_id,
-                    )
-                    self.events.append(event)
-
-                    # Send response
-                    response = self.build_query_response(query)
-                    writer.write(response)
-                    await writer.drain()
+                await writer.drain()
 
             except asyncio.TimeoutError:
                 break
 
-    def build_greeting_packet(self) -> bytes:
-        """Build MySQL greeting packet"""
-        packet = bytearray()
-
-        # Protocol version
-        packet.append(self.MYSQL_PROTOCOL_VERSION)
-
-        # Server version (null-terminated)
-        packet.extend(self.MYSQL_SERVER_VERSION)
-        packet.append(0)
-
-        # Connection ID
-        packet.extend(struct.pack("<I", self.connection_id))
-
-        # Auth plugin data part 1 (8 bytes)
-        packet.extend(os.urandom(8))
-
-        # Filler
-        packet.append(0)
-
-        # Capability flags (lower 2 bytes)
-        packet.extend(struct.pack("<H", 0xF7FF))
-
-        # Character set
-        packet.append(33)  # utf8
-
-        # Status flags
-        packet.extend(struct.pack("<H", 0x0002))
+    def handle_query_packet(
+        self,
+        packet: memoryview,
+        writer: asyncio.StreamWriter,
+        session_id: str,
+        client_ip: str,
+        client_port: int,
+    ):
+        """Handle a single framed MySQL command packet"""
+        # Parse query
+        query = self.parse_query_packet(packet)
+        if not query:
+            return
 
-        # Capability flags (upper 2 bytes)
-        packet.extend(struct.pack("<H", 0x0081))
+        self.total_queries += 1
+        is_injection = self.detect_injection(query)
 
-        # Length of auth plugin data
-        packet.append(21)
+        log_data = {
+            "event": "sql_query",
+            "session_id": session_id,
+            "query": query[:200],
+        }
 
-        # Reserved
-        packet.extend(b"\x00" * 10)
+        if is_injection:
+            self.injections_detected += 1
+            log_data["attack"] = "sql_injection"
+            logger.warning(orjson.dumps(log_data).decode())
+        else:
+            logger.info(orjson.dumps(log_data).decode())
+
+        event = DBEvent(
+            timestamp=_iso_now(),
+            event_type="sql_query",
+            source_ip=client_ip,
+            source_port=client_port,
+            protocol="mysql",
+            query=query,
+            is_injection=is_injection,
+            session_id=session_id,
+        )
+        self.events.append(event)
 
-        # Auth plugin data part 2 (12 bytes)
-        packet.extend(os.urandom(12))
-        packet.append(0)
+        # Queue response (flushed once per read)
+        writer.write(self.build_query_response(query))
 
-        # Auth plugin name
-        packet.extend(b"mysql_native_password")
-        packet.append(0)
+    def build_greeting_packet(self) -> bytes:
+        """Build MySQL greeting packet"""
+        # Only the connection ID and the auth scramble vary per connection
+        packet = b"".join((
+            self.GREETING_HEAD,
+            struct.pack("<I8s", self.connection_id, os.urandom(8)),
+            self.GREETING_CAPABILITIES,
+            os.urandom(12),
+            self.GREETING_TAIL,
+        ))
 
         # Build packet header
-        length = len(packet)
-        header = struct.pack("<I", length)[:3] + b"\x00"
+        header = struct.pack("<I", len(packet))[:3] + b"\x00"
 
-        return header + bytes(packet)
+        return header + packet
 
     def build_ok_packet(self) -> bytes:
         """Build MySQL OK packet"""
-        packet = bytearray()
-        packet.append(0x00)  # OK header
-        packet.append(0)  # affected rows
-        packet.append(0)  # last insert id
-        packet.extend(struct.pack("<H", 0x0002))  # status flags
-        packet.extend(struct.pack("<H", 0))  # warnings
-
-        header = struct.pack("<I", len(packet))[:3] + b"\x02"
-        return header + bytes(packet)
+        return self.OK_PACKET
 
     def build_query_response(self, query: str) -> bytes:
         """Build response to query"""
@@ -312,40 +443,7 @@ class MySQLHoneypot:
 
     def build_empty_result(self) -> bytes:
         """Build empty result set"""
-        result = bytearray()
-
-        # Column count packet
-        col_count = b"\x01\x00\x00\x01\x01"  # 1 column
-        result.extend(col_count)
-
-        # Column definition (simplified)
-        col_def = bytearray()
-        col_def.extend(b"\x03def")  # catalog
-        col_def.append(0)  # schema
-        col_def.append(0)  # table
-        col_def.append(0)  # org_table
-        col_def.extend(b"\x06result")  # name
-        col_def.append(0)  # org_name
-        col_def.append(0x0c)  # length of fixed fields
-        col_def.extend(struct.pack("<H", 33))  # charset
-        col_def.extend(struct.pack("<I", 255))  # column length
-        col_def.append(0xfd)  # column type (varchar)
-        col_def.extend(struct.pack("<H", 0))  # flags
-        col_def.append(0)  # decimals
-        col_def.extend(b"\x00\x00")  # filler
-
-        col_header = struct.pack("<I", len(col_def))[:3] + b"\x02"
-        result.extend(col_header + bytes(col_def))
-
-        # EOF packet
-        eof = b"\x05\x00\x00\x03\xfe\x00\x00\x02\x00"
-        result.extend(eof)
-
-        # No rows - just EOF
-        eof2 = b"\x05\x00\x00\x04\xfe\x00\x00\x02\x00"
-        result.extend(eof2)
-
-        return bytes(result)
+        return self.EMPTY_RESULT
 
     def parse_auth_packet(self, data: bytes) -> tuple:
         """Parse authentication packet"""
@@ -356,12 +454,13 @@ class MySQLHoneypot:
             # Skip header (4 bytes) and capabilities (4 bytes) and max packet (4 bytes)
             # and charset (1 byte) and reserved (23 bytes)
             offset = 36
+            view = memoryview(data)  # decode fields in place, no slice copies
 
             # Username (null-terminated)
             username_end = data.find(b"\x00", offset)
             if username_end == -1:
                 return ("unknown", "")
-            username = data[offset:username_end].decode("utf-8", errors="ignore")
+            username = str(view[offset:username_end], "utf-8", "ignore")
 
             # Skip auth response
             offset = username_end + 1
@@ -374,7 +473,7 @@ class MySQLHoneypot:
             if offset < len(data):
                 db_end = data.find(b"\x00", offset)
                 if db_end != -1:
-                    database = data[offset:db_end].decode("utf-8", errors="ignore")
+                    database = str(view[offset:db_end], "utf-8", "ignore")
 
             return (username, database)
 
@@ -392,8 +491,8 @@ class MySQLHoneypot:
             if command != 0x03:  # COM_QUERY
                 return None
 
-            # Query starts at byte 5
-            query = data[5:].decode("utf-8", errors="ignore")
+            # Query starts at byte 5 (decoded in place, no slice copy)
+            query = str(memoryview(data)[5:], "utf-8", "ignore")
             return query.strip()
 
         except Exception:
@@ -401,10 +500,20 @@ class MySQLHoneypot:
 
     def detect_injection(self, query: str) -> bool:
         """Detect SQL injection attempts"""
-        for pattern in self.injection_patterns:
-            if pattern.search(query):
-                return True
-        return False
+        if _HS_DB is not None:
+            hits = []
+            try:
+                _HS_DB.scan(
+                    query.encode("utf-8", "ignore"),
+                    match_event_handler=_on_injection_match,
+                    context=hits,
+                    scratch=self.hs_scratch,
+                )
+            except hyperscan.ScanTerminated:
+                pass
+            return bool(hits)
+
+        return _INJECTION_RE.search(query) is not None
 
     def get_metrics(self) -> dict:
         """Return current metrics"""
@@ -425,15 +534,19 @@ async def main():
     else:
         port = int(port_str)
     max_connections = int(os.getenv("MAX_CONNECTIONS", "25"))
+    event_buffer = int(os.getenv("EVENT_BUFFER", "4096"))
 
     honeypot = MySQLHoneypot(
         host=host,
         port=port,
         max_connections=max_connections,
+        event_buffer=event_buffer,
     )
 
     await honeypot.start()
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(main())
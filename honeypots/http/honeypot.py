@@ -5,24 +5,51 @@ Emulates common web services and detects attacks
 """
 
 import asyncio
-import hashlib
-import json
 import logging
 import os
 import re
+import secrets
 import time
-from dataclasses import dataclass, asdict
-from datetime import datetime
-from typing import Dict, List, Optional
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
 from urllib.parse import parse_qs, urlparse
 
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # Optional: default asyncio event loop
+    uvloop = None
+
+try:
+    import hyperscan
+except ImportError:  # Optional: fall back to the stdlib regex scan
+    hyperscan = None
+
 # Configure logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 logging.basicConfig(level=getattr(logging, LOG_LEVEL))
 logger = logging.getLogger("http-honeypot")
 
 
-@dataclass
+# Event timestamps: the "YYYY-MM-DDTHH:MM:SS" part is formatted once per second
+_ts_second = -1
+_ts_prefix = ""
+
+
+def _iso_now() -> str:
+    """Current UTC time as ISO-8601 with microseconds"""
+    global _ts_second, _ts_prefix
+    now_us = time.time_ns() // 1000
+    second, micros = divmod(now_us, 1_000_000)
+    if second != _ts_second:
+        _ts_second = second
+        _ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+    return f"{_ts_prefix}.{micros:06d}"
+
+
+@dataclass(slots=True)
 class HTTPEvent:
     """Represents an HTTP interaction event"""
     timestamp: str
@@ -38,35 +65,49 @@ class HTTPEvent:
     session_id: str = ""
 
     def to_json(self) -> str:
-        return json.dumps(asdict(self))
+        # orjson serializes (slotted) dataclasses natively, no asdict() copy
+        return orjson.dumps(self).decode()
+
+
+class _LazyJson:
+    """Log message that is serialized only when a handler formats it"""
+    __slots__ = ("data",)
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    def __str__(self) -> str:
+        return orjson.dumps(self.data).decode()
 
 
 # SQL Injection patterns
+# Wildcards are bounded ({m,n}) so attacker-controlled input cannot force
+# super-linear backtracking
 SQL_INJECTION_PATTERNS = [
     r"(\%27)|(\')|(\-\-)|(\%23)|(#)",
-    r"((\%3D)|(=))[^\n]*((\%27)|(\')|(\-\-)|(\%3B)|(;))",
-    r"\w*((\%27)|(\'))((\%6F)|o|(\%4F))((\%72)|r|(\%52))",
+    r"((\%3D)|(=))[^\n]{0,256}((\%27)|(\')|(\-\-)|(\%3B)|(;))",
+    r"((\%27)|(\'))((\%6F)|o|(\%4F))((\%72)|r|(\%52))",
     r"((\%27)|(\'))union",
     r"exec(\s|\+)+(s|x)p\w+",
     r"UNION\s+SELECT",
-    r"SELECT\s+.*\s+FROM",
+    r"SELECT\s.{0,256}\sFROM",
     r"INSERT\s+INTO",
     r"DELETE\s+FROM",
     r"DROP\s+TABLE",
-    r"UPDATE\s+.*\s+SET",
+    r"UPDATE\s.{0,256}\sSET",
     r"OR\s+1\s*=\s*1",
-    r"OR\s+'[^']*'\s*=\s*'[^']*'",
+    r"OR\s+'[^']{0,256}'\s*=\s*'[^']{0,256}'",
 ]
 
 # XSS patterns
 XSS_PATTERNS = [
-    r"<script[^>]*>",
+    r"<script[^>]{0,256}>",
     r"javascript:",
     r"onerror\s*=",
     r"onload\s*=",
     r"onclick\s*=",
     r"<iframe",
-    r"<img[^>]+onerror",
+    r"<img[^>]{1,256}onerror",
 ]
 
 # Path traversal patterns
@@ -79,6 +120,29 @@ PATH_TRAVERSAL_PATTERNS = [
     r"boot\.ini",
 ]
 
+# Only the head of each request field is scanned for signatures
+MAX_SCAN_LENGTH = 4096
+
+# Pre-encoded response header lines shared by every fake service
+JSON_CONTENT_TYPE = b"Content-Type: application/json\r\n"
+HTML_CONTENT_TYPE = b"Content-Type: text/html\r\n"
+RESPONSE_TRAILER = b"Server: Apache/2.4.41 (Ubuntu)\r\nConnection: close\r\n\r\n"
+
+# Unsent bytes above which a response write waits for the socket to drain
+DRAIN_THRESHOLD = 16 * 1024
+
+# Request framing: time allowed to receive a request, the most head and
+# body bytes read. The head ends at a blank line, CRLF or bare LF.
+REQUEST_TIMEOUT = 10.0
+MAX_HEAD_SIZE = 64 * 1024
+MAX_BODY_SIZE = 16 * 1024
+_HEAD_END_RE = re.compile(rb"\r?\n\r?\n")
+
+# What the in-memory event buffer keeps of a request: characters per field
+# (headers count as one field) and number of headers
+EVENT_FIELD_LIMIT = 1000
+EVENT_MAX_HEADERS = 32
+
 # Suspicious paths that attackers commonly probe
 SUSPICIOUS_PATHS = [
     "/admin",
@@ -104,6 +168,50 @@ SUSPICIOUS_PATHS = [
     "/metrics",
 ]
 
+# Hyperscan match ids, in detection priority order
+SQL_ATTACK_ID = 0
+XSS_ATTACK_ID = 1
+
+
+def _on_attack_match(attack_id, start, end, flags, context) -> bool:
+    """Hyperscan match callback: record the category, stop on SQL injection"""
+    context.add(attack_id)
+    return attack_id == SQL_ATTACK_ID
+
+
+def _build_hyperscan_db():
+    """SQL + XSS signatures in one multi-pattern DFA"""
+    expressions = SQL_INJECTION_PATTERNS + XSS_PATTERNS
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[p.encode() for p in expressions],
+        ids=[SQL_ATTACK_ID] * len(SQL_INJECTION_PATTERNS) + [XSS_ATTACK_ID] * len(XSS_PATTERNS),
+        elements=len(expressions),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions),
+    )
+    return db
+
+
+def _may_be_xss(text: str) -> bool:
+    """Cheap prefilter: every XSS signature contains "<", ":" or "="
+
+    SQL signatures include bare keywords (UNION SELECT, INSERT INTO, ...),
+    so there is no equivalent character prefilter for them.
+    """
+    return "<" in text or "=" in text or ":" in text
+
+
+# Signatures, compiled once at import and shared by all instances.
+# Each category is one alternation: one search per category.
+_SQL_RE = re.compile("|".join(f"(?:{p})" for p in SQL_INJECTION_PATTERNS), re.IGNORECASE)
+_XSS_RE = re.compile("|".join(f"(?:{p})" for p in XSS_PATTERNS), re.IGNORECASE)
+_PATH_RE = re.compile("|".join(f"(?:{p})" for p in PATH_TRAVERSAL_PATTERNS), re.IGNORECASE)
+_HS_DB = _build_hyperscan_db() if hyperscan is not None else None
+_SUSPICIOUS_PATHS_LC = tuple(dict.fromkeys(p.lower() for p in SUSPICIOUS_PATHS))
+
+# Suspicious-path lookup: one search over the path for the whole list
+_SUSPICIOUS_RE = re.compile("|".join(re.escape(p) for p in _SUSPICIOUS_PATHS_LC))
+
 
 class HTTPHoneypot:
     """Lightweight HTTP Honeypot implementation"""
@@ -113,20 +221,31 @@ class HTTPHoneypot:
         host: str = "0.0.0.0",
         port: int = 8080,
         max_connections: int = 100,
+        event_buffer: int = 10000,
     ):
         self.host = host
         self.port = port
         self.max_connections = max_connections
         self.active_connections = 0
-        self.events: List[HTTPEvent] = []
 
-        # Compile regex patterns
-        self.sql_patterns = [re.compile(p, re.IGNORECASE) for p in SQL_INJECTION_PATTERNS]
-        self.xss_patterns = [re.compile(p, re.IGNORECASE) for p in XSS_PATTERNS]
-        self.path_patterns = [re.compile(p, re.IGNORECASE) for p in PATH_TRAVERSAL_PATTERNS]
+        # Connections beyond the limit wait for a slot instead of being dropped,
+        # up to max_connections waiters for at most REQUEST_TIMEOUT each
+        self._connection_slots = asyncio.Semaphore(max_connections)
+        self._waiting_connections = 0
+        self.events: Deque[HTTPEvent] = deque(maxlen=event_buffer)
+
+        # Hyperscan scratch space is per instance; the database is shared
+        self.hs_scratch = hyperscan.Scratch(_HS_DB) if _HS_DB is not None else None
 
         # Fake service responses
         self.fake_services = self._load_fake_services()
+        self._404 = self._build_response(404, "Not Found", "<html><body><h1>404 Not Found</h1></body></html>")
+
+        # Prefix routes in insertion order: the alternation picks the first
+        # matching route, same as scanning the dict for a startswith() hit
+        self._service_prefix_re = re.compile(
+            "|".join(re.escape(p) for p in self.fake_services if p != "/")
+        )
 
         # Metrics
         self.total_requests = 0
@@ -148,22 +267,51 @@ class HTTPHoneypot:
     async def start(self):
         """Start the HTTP honeypot server"""
         server = await asyncio.start_server(
-            self.handle_connection,
+            self._handle_gated,
             self.host,
             self.port,
             limit=1024 * 128,  # 128KB buffer
         )
 
         addr = server.sockets[0].getsockname()
-        logger.info(json.dumps({
+        logger.info(orjson.dumps({
             "event": "server_started",
             "host": addr[0],
             "port": addr[1],
-        }))
+        }).decode())
 
         async with server:
             await server.serve_forever()
 
+    async def _handle_gated(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """Run handle_connection once one of max_connections slots is free"""
+        slots = self._connection_slots
+        if slots.locked():
+            # Full: queue behind the active connections, but only so many
+            # and only for so long, so a flood cannot pile up sockets
+            if self._waiting_connections >= self.max_connections:
+                writer.close()
+                return
+            self._waiting_connections += 1
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout=REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                writer.close()
+                return
+            finally:
+                self._waiting_connections -= 1
+        else:
+            await slots.acquire()
+
+        self.active_connections += 1
+        try:
+            await self.handle_connection(reader, writer)
+        finally:
+            self.active_connections -= 1
+            slots.release()
+
     async def handle_connection(
         self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
     ):
@@ -171,139 +319,210 @@ class HTTPHoneypot:
         addr = writer.get_extra_info("peername")
         client_ip, client_port = addr[0], addr[1]
 
-        if self.active_connections >= self.max_connections:
-            writer.close()
-            await writer.wait_closed()
-            return
-
-        self.active_connections += 1
-        session_id = hashlib.sha256(f"{client_ip}:{client_port}:{time.time()}".encode()).hexdigest()[:16]
+        session_id = secrets.token_hex(8)
 
         try:
-            # Read request
-            request_data = await asyncio.wait_for(reader.read(8192), timeout=30.0)
+            # Read the request head up to the blank line. If the peer stalls
+            # or closes first, whatever it sent is still parsed and logged.
+            deadline = asyncio.get_running_loop().time() + REQUEST_TIMEOUT
+            request_data = await self.read_head(reader, deadline)
             if not request_data:
                 return
 
             # Parse request
-            request = self.parse_request(request_data.decode("utf-8", errors="ignore"))
+            request = self.parse_request(request_data)
             if not request:
                 return
 
             self.total_requests += 1
-            method, path, headers, body = request
+            method, path, headers, raw_body = request
+
+            # Read the rest of the body as framed by Content-Length, keeping at most MAX_BODY_SIZE
+            body_size = min(self.content_length(headers), MAX_BODY_SIZE)
+            raw_body = bytearray(raw_body)
+            while len(raw_body) < body_size:
+                chunk = await self.read_chunk(reader, deadline)
+                if not chunk:
+                    break
+                raw_body += chunk
+            body = raw_body[:MAX_BODY_SIZE].decode("utf-8", errors="ignore")
 
             # Detect attacks
             attack_type = self.detect_attack(path, headers, body)
 
             # Log event
             event = HTTPEvent(
-                timestamp=datetime.utcnow().isoformat(),
+                timestamp=_iso_now(),
                 event_type="http_request",
                 source_ip=client_ip,
                 source_port=client_port,
-                method=method,
-                path=path,
-                headers=headers,
-                body=body[:1000],  # Truncate body
-                user_agent=headers.get("User-Agent", ""),
+                method=method[:EVENT_FIELD_LIMIT],
+                path=path[:EVENT_FIELD_LIMIT],
+                headers=self.truncate_headers(headers),
+                body=body[:EVENT_FIELD_LIMIT],
+                user_agent=headers.get("User-Agent", "")[:EVENT_FIELD_LIMIT],
                 attack_type=attack_type,
                 session_id=session_id,
             )
 
-            log_data = {
-                "event": "http_request",
-                "session_id": session_id,
-                "method": method,
-                "path": path,
-                "source_ip": client_ip,
-                "user_agent": headers.get("User-Agent", "")[:100],
-            }
-
             if attack_type:
-                log_data["attack_type"] = attack_type
                 self.attacks_detected += 1
-                logger.warning(json.dumps(log_data))
-            else:
-                logger.info(json.dumps(log_data))
+
+            # Skip building the record when plain requests would be dropped
+            if attack_type or logger.isEnabledFor(logging.INFO):
+                log_data = {
+                    "event": "http_request",
+                    "session_id": session_id,
+                    "method": method,
+                    "path": path,
+                    "source_ip": client_ip,
+                    "user_agent": headers.get("User-Agent", "")[:100],
+                }
+
+                if attack_type:
+                    log_data["attack_type"] = attack_type
+                    logger.warning(orjson.dumps(log_data).decode())
+                else:
+                    logger.info(_LazyJson(log_data))
 
             self.events.append(event)
 
             # Send response
             response = self.get_response(path, method, headers)
             writer.write(response)
-            await writer.drain()
+            # Responses are small and the connection is closed right after;
+            # only yield to the loop when the transport is actually backed up
+            if writer.transport.get_write_buffer_size() > DRAIN_THRESHOLD:
+                await writer.drain()
 
-        except asyncio.TimeoutError:
-            pass
         except Exception as e:
-            logger.error(json.dumps({"event": "error", "error": str(e)}))
+            logger.error(orjson.dumps({"event": "error", "error": str(e)}).decode())
         finally:
-            self.active_connections -= 1
             writer.close()
             try:
                 await writer.wait_closed()
             except Exception:
                 pass
 
-    def parse_request(self, data: str) -> Optional[tuple]:
-        """Parse HTTP request"""
+    async def read_chunk(self, reader: asyncio.StreamReader, deadline: float) -> bytes:
+        """Next bytes from the peer; b"" on EOF or once the deadline has passed"""
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            return b""
         try:
-            lines = data.split("\r\n")
-            if not lines:
-                return None
+            return await asyncio.wait_for(reader.read(MAX_HEAD_SIZE), timeout=remaining)
+        except asyncio.TimeoutError:
+            return b""
+
+    async def read_head(self, reader: asyncio.StreamReader, deadline: float) -> bytearray:
+        """Read until the blank line ending the head, MAX_HEAD_SIZE, EOF or the deadline"""
+        data = bytearray()
+        start = 0
+        while len(data) < MAX_HEAD_SIZE and _HEAD_END_RE.search(data, start) is None:
+            # Only rescan new bytes; a terminator can straddle the old end by 3
+            start = max(len(data) - 3, 0)
+            chunk = await self.read_chunk(reader, deadline)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def parse_request(self, data: bytes) -> Optional[tuple]:
+        """Parse HTTP request; the body part is returned as raw bytes"""
+        try:
+            # Locate the header/body boundary (CRLF or bare-LF blank line)
+            sep = _HEAD_END_RE.search(data)
+            if sep is None:
+                head, body = data, b""
+            else:
+                head, body = data[:sep.start()], data[sep.end():]
+
+            # Decode the head once rather than every header key and value
+            request_line, _, header_block = head.decode("utf-8", errors="ignore").partition("\n")
 
             # Parse request line
-            request_line = lines[0].split(" ")
-            if len(request_line) < 2:
+            parts = request_line.rstrip("\r").split(" ", 2)
+            if len(parts) < 2:
                 return None
 
-            method = request_line[0]
-            path = request_line[1]
+            method, path = parts[0], parts[1]
 
-            # Parse headers
+            # Parse headers (only the header block is split, never the body)
             headers = {}
-            body_start = 0
-            for i, line in enumerate(lines[1:], 1):
-                if line == "":
-                    body_start = i + 1
-                    break
-                if ": " in line:
-                    key, value = line.split(": ", 1)
+            for line in header_block.split("\n"):
+                key, found, value = line.rstrip("\r").partition(": ")
+                if found:
                     headers[key] = value
 
-            # Get body
-            body = "\r\n".join(lines[body_start:]) if body_start < len(lines) else ""
-
             return (method, path, headers, body)
 
         except Exception:
             return None
 
+    def truncate_headers(self, headers: dict) -> dict:
+        """Copy of headers cut to EVENT_MAX_HEADERS / EVENT_FIELD_LIMIT characters"""
+        kept = {}
+        budget = EVENT_FIELD_LIMIT
+        for key, value in headers.items():
+            if budget <= 0 or len(kept) >= EVENT_MAX_HEADERS:
+                break
+            key = key[:budget]
+            value = value[:budget - len(key)]
+            kept[key] = value
+            budget -= len(key) + len(value)
+        return kept
+
+    def content_length(self, headers: dict) -> int:
+        """Declared body length; a missing or malformed header counts as 0"""
+        value = headers.get("Content-Length") or headers.get("content-length") or ""
+        try:
+            return max(int(value), 0)
+        except ValueError:
+            return 0
+
     def detect_attack(self, path: str, headers: dict, body: str) -> str:
         """Detect various attack types"""
-        full_input = f"{path} {body} {' '.join(headers.values())}"
+        # Scan each source on its own, path first (most probes are path-based),
+        # instead of copying them all into one concatenated buffer
+        sources = (path, body, *headers.values())
 
-        # Check SQL injection
-        for pattern in self.sql_patterns:
-            if pattern.search(full_input):
+        if _HS_DB is not None:
+            hits = set()
+            try:
+                for text in sources:
+                    _HS_DB.scan(
+                        text[:MAX_SCAN_LENGTH].encode("utf-8", "ignore"),
+                        match_event_handler=_on_attack_match,
+                        context=hits,
+                        scratch=self.hs_scratch,
+                    )
+            except hyperscan.ScanTerminated:
+                pass
+            if SQL_ATTACK_ID in hits:
+                return "sql_injection"
+            if XSS_ATTACK_ID in hits:
+                return "xss"
+        else:
+            # Check SQL injection
+            if any(_SQL_RE.search(text, 0, MAX_SCAN_LENGTH) for text in sources):
                 return "sql_injection"
 
-        # Check XSS
-        for pattern in self.xss_patterns:
-            if pattern.search(full_input):
+            # Check XSS
+            if any(
+                _XSS_RE.search(text, 0, MAX_SCAN_LENGTH)
+                for text in sources
+                if _may_be_xss(text)
+            ):
                 return "xss"
 
         # Check path traversal
-        for pattern in self.path_patterns:
-            if pattern.search(path):
-                return "path_traversal"
+        if _PATH_RE.search(path, 0, MAX_SCAN_LENGTH):
+            return "path_traversal"
 
         # Check suspicious paths
         parsed_path = urlparse(path).path.lower()
-        for suspicious in SUSPICIOUS_PATHS:
-            if suspicious.lower() in parsed_path:
-                return "reconnaissance"
+        if _SUSPICIOUS_RE.search(parsed_path):
+            return "reconnaissance"
 
         return ""
 
@@ -316,24 +535,24 @@ class HTTPHoneypot:
             return self.fake_services[parsed_path]
 
         # Check for prefix match
-        for service_path in self.fake_services:
-            if parsed_path.startswith(service_path) and service_path != "/":
-                return self.fake_services[service_path]
+        match = self._service_prefix_re.match(parsed_path)
+        if match:
+            return self.fake_services[match.group()]
 
         # Default 404 response
-        return self._build_response(404, "Not Found", "<html><body><h1>404 Not Found</h1></body></html>")
+        return self._404
 
     def _build_response(self, status_code: int, status_text: str, body: str) -> bytes:
-        """Build HTTP response"""
-        content_type = "application/json" if body.startswith("{") else "text/html"
-        response = f"HTTP/1.1 {status_code} {status_text}\r\n"
-        response += f"Content-Type: {content_type}\r\n"
-        response += f"Content-Length: {len(body)}\r\n"
-        response += "Server: Apache/2.4.41 (Ubuntu)\r\n"
-        response += "Connection: close\r\n"
-        response += "\r\n"
-        response += body
-        return response.encode()
+        """Build HTTP response (called once per route at startup)"""
+        payload = body.encode()
+        content_type = JSON_CONTENT_TYPE if body.startswith("{") else HTML_CONTENT_TYPE
+        return b"".join([
+            b"HTTP/1.1 %d %s\r\n" % (status_code, status_text.encode()),
+            content_type,
+            b"Content-Length: %d\r\n" % len(payload),
+            RESPONSE_TRAILER,
+            payload,
+        ])
 
     def _get_index_page(self) -> str:
         return """<!DOCTYPE html>
@@ -380,15 +599,19 @@ async def main():
     else:
         port = int(port_str)
     max_connections = int(os.getenv("MAX_CONNECTIONS", "100"))
+    event_buffer = int(os.getenv("EVENT_BUFFER", "10000"))
 
     honeypot = HTTPHoneypot(
         host=host,
         port=port,
         max_connections=max_connections,
+        event_buffer=event_buffer,
     )
 
     await honeypot.start()
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(main())
@@ -5,21 +5,57 @@ Captures email attempts and spam
 """
 
 import asyncio
-import hashlib
-import json
 import logging
 import os
+import re
+import secrets
 import time
-from dataclasses import dataclass, asdict
-from datetime import datetime
-from typing import List
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, List
+
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # Optional: default asyncio event loop
+    uvloop = None
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 logging.basicConfig(level=getattr(logging, LOG_LEVEL))
 logger = logging.getLogger("smtp-honeypot")
 
+# Subject header line; only the header block is searched
+SUBJECT_RE = re.compile(rb"^Subject:[ \t]*(.*)$", re.IGNORECASE | re.MULTILINE)
+MAX_HEADER_SCAN = 4096
+
+# Static SMTP replies, encoded once
+REPLY_OK = b"250 OK\r\n"
+REPLY_QUEUED = b"250 OK: Message queued\r\n"
+REPLY_START_DATA = b"354 Start mail input; end with <CRLF>.<CRLF>\r\n"
+REPLY_BYE = b"221 Bye\r\n"
+REPLY_CANNOT_VRFY = b"252 Cannot VRFY user\r\n"
+REPLY_AUTH_OK = b"235 Authentication successful\r\n"
+REPLY_UNRECOGNIZED = b"500 Command not recognized\r\n"
+
+
+# Event timestamps: the "YYYY-MM-DDTHH:MM:SS" part is formatted once per second
+_ts_second = -1
+_ts_prefix = ""
 
-@dataclass
+
+def _iso_now() -> str:
+    """Current UTC time as ISO-8601 with microseconds"""
+    global _ts_second, _ts_prefix
+    now_us = time.time_ns() // 1000
+    second, micros = divmod(now_us, 1_000_000)
+    if second != _ts_second:
+        _ts_second = second
+        _ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+    return f"{_ts_prefix}.{micros:06d}"
+
+
+@dataclass(slots=True)
 class SMTPEvent:
     """Represents an SMTP interaction event"""
     timestamp: str
@@ -37,7 +73,19 @@ class SMTPEvent:
             self.rcpt_to = []
 
     def to_json(self) -> str:
-        return json.dumps(asdict(self))
+        # orjson serializes (slotted) dataclasses natively, no asdict() copy
+        return orjson.dumps(self).decode()
+
+
+@dataclass(slots=True)
+class SMTPSession:
+    """Per-connection SMTP transaction state"""
+    session_id: str
+    mail_from: str = ""
+    rcpt_to: List[str] = field(default_factory=list)
+    in_data: bool = False
+    closing: bool = False
+    message_buf: bytearray = field(default_factory=bytearray)  # DATA lines, each terminated by \n
 
 
 class SMTPHoneypot:
@@ -48,14 +96,31 @@ class SMTPHoneypot:
         host: str = "0.0.0.0",
         port: int = 2525,
         max_message_size: int = 1048576,  # 1MB
+        event_buffer: int = 10000,
     ):
         self.host = host
         self.port = port
         self.max_message_size = max_message_size
         self.active_connections = 0
-        self.events: List[SMTPEvent] = []
+        self.events: Deque[SMTPEvent] = deque(maxlen=event_buffer)
 
         self.hostname = os.getenv("HOSTNAME", "mail.example.com")
+        self._greeting = f"220 {self.hostname} ESMTP ready\r\n".encode()
+        self._helo_reply = f"250 {self.hostname}\r\n".encode()
+
+        # SMTP verb -> handler, one dict lookup per command
+        self._cmd_handlers = {
+            "HELO": self._cmd_helo,
+            "EHLO": self._cmd_helo,
+            "MAIL": self._cmd_mail,
+            "RCPT": self._cmd_rcpt,
+            "DATA": self._cmd_data,
+            "RSET": self._cmd_rset,
+            "NOOP": self._cmd_noop,
+            "QUIT": self._cmd_quit,
+            "VRFY": self._cmd_vrfy,
+            "AUTH": self._cmd_auth,
+        }
 
         # Metrics
         self.total_connections = 0
@@ -71,12 +136,12 @@ class SMTPHoneypot:
         )
 
         addr = server.sockets[0].getsockname()
-        logger.info(json.dumps({
+        logger.info(orjson.dumps({
             "event": "server_started",
             "protocol": "smtp",
             "host": addr[0],
             "port": addr[1],
-        }))
+        }).decode())
 
         async with server:
             await server.serve_forever()
@@ -90,24 +155,21 @@ class SMTPHoneypot:
 
         self.active_connections += 1
         self.total_connections += 1
-        session_id = hashlib.sha256(f"{client_ip}:{client_port}:{time.time()}".encode()).hexdigest()[:16]
+        session_id = secrets.token_hex(8)
 
-        logger.info(json.dumps({
+        logger.info(orjson.dumps({
             "event": "connection_opened",
             "session_id": session_id,
             "source_ip": client_ip,
             "protocol": "smtp",
-        }))
+        }).decode())
 
-        # Session state
-        mail_from = ""
-        rcpt_to = []
-        in_data = False
-        message_data = []
+        session = SMTPSession(session_id=session_id)
+        message_buf = session.message_buf
 
         try:
             # Send greeting
-            await self.send_response(writer, f"220 {self.hostname} ESMTP ready")
+            await self.send_response(writer, self._greeting)
 
             while True:
                 try:
@@ -117,106 +179,61 @@ class SMTPHoneypot:
 
                     line = line.decode("utf-8", errors="ignore").strip()
 
-                    if in_data:
+                    if session.in_data:
                         if line == ".":
                             # End of message
-                            in_data = False
+                            session.in_data = False
                             self.total_messages += 1
 
-                            message = "\n".join(message_data)
-                            subject = self.extract_subject(message)
+                            message = message_buf[:-1].decode("utf-8", "ignore")
+                            subject = self.extract_subject(message_buf)
 
                             event = SMTPEvent(
-                                timestamp=datetime.utcnow().isoformat(),
+                                timestamp=_iso_now(),
                                 event_type="smtp_message",
                                 source_ip=client_ip,
                                 source_port=client_port,
-                                mail_from=mail_from,
-                                rcpt_to=rcpt_to,
+                                mail_from=session.mail_from,
+                                rcpt_to=session.rcpt_to,
                                 subject=subject,
                                 message_size=len(message),
                                 session_id=session_id,
                             )
                             self.events.append(event)
 
-                            logger.warning(json.dumps({
+                            logger.warning(orjson.dumps({
                                 "event": "message_received",
                                 "session_id": session_id,
-                                "mail_from": mail_from,
-                                "rcpt_to": rcpt_to,
+                                "mail_from": session.mail_from,
+                                "rcpt_to": session.rcpt_to,
                                 "subject": subject[:100],
                                 "size": len(message),
-                            }))
+                            }).decode())
 
-                            await self.send_response(writer, "250 OK: Message queued")
-                            message_data = []
+                            await self.send_response(writer, REPLY_QUEUED)
+                            message_buf.clear()
                         else:
-                            if len("\n".join(message_data)) < self.max_message_size:
-                                message_data.append(line)
+                            if len(message_buf) <= self.max_message_size:
+                                message_buf += line.encode()
+                                message_buf += b"\n"
                         continue
 
-                    # Parse SMTP commands
-                    command = line.upper().split()[0] if line else ""
-
-                    if command == "HELO" or command == "EHLO":
-                        await self.send_response(writer, f"250 {self.hostname}")
-
-                    elif command == "MAIL":
-                        mail_from = self.extract_address(line)
-                        logger.info(json.dumps({
-                            "event": "mail_from",
-                            "session_id": session_id,
-                            "address": mail_from,
-                        }))
-                        await self.send_response(writer, "250 OK")
-
-                    elif command == "RCPT":
-                        rcpt = self.extract_address(line)
-                        rcpt_to.append(rcpt)
-                        logger.info(json.dumps({
-                            "event": "rcpt_to",
-                            "session_id": session_id,
-                            "address": rcpt,
-                        }))
-                        await self.send_response(writer, "250 OK")
-
-                    elif command == "DATA":
-                        in_data = True
-                        await self.send_response(writer, "354 Start mail input; end with <CRLF>.<CRLF>")
-
-                    elif command == "RSET":
-                        mail_from = ""
-                        rcpt_to = []
-                        message_data = []
-                        await self.send_response(writer, "250 OK")
-
-                    elif command == "NOOP":
-                        await self.send_response(writer, "250 OK")
-
-                    elif command == "QUIT":
-                        await self.send_response(writer, "221 Bye")
-                        break
-
-                    elif command == "VRFY":
-                        await self.send_response(writer, "252 Cannot VRFY user")
-
-                    elif command == "AUTH":
-                        # Log auth attempt
-                        logger.warning(json.dumps({
-                            "event": "auth_attempt",
-                            "session_id": session_id,
-                            "command": line,
-                        }))
-                        await self.send_response(writer, "235 Authentication successful")
+                    # Dispatch SMTP command
+                    command = line.split(None, 1)[0].upper() if line else ""
+                    handler = self._cmd_handlers.get(command)
+                    if handler is None:
+                        await self.send_response(writer, REPLY_UNRECOGNIZED)
+                        continue
 
-                    else:
-                        await self.send_response(writer, "500 Command not recognized")
+                    await self.send_response(writer, handler(session, line))
+                    if session.closing:
+                        break
 
                 except asyncio.TimeoutError:
                     break
 
         except Exception as e:
-            logger.error(json.dumps({"event": "error", "error": str(e)}))
+            logger.error(orjson.dumps({"event": "error", "error": str(e)}).decode())
         finally:
             self.active_connections -= 1
             writer.close()
@@ -225,16 +242,69 @@ class SMTPHoneypot:
             except Exception:
                 pass
 
-            logger.info(json.dumps({
+            logger.info(orjson.dumps({
                 "event": "connection_closed",
                 "session_id": session_id,
-            }))
+            }).decode())
 
-    async def send_response(self, writer: asyncio.StreamWriter, message: str):
-        """Send SMTP response"""
-        writer.write(f"{message}\r\n".encode())
+    async def send_response(self, writer: asyncio.StreamWriter, reply: bytes):
+        """Send a pre-encoded SMTP reply"""
+        writer.write(reply)
         await writer.drain()
 
+    # SMTP command handlers: update the session, return the reply to send
+
+    def _cmd_helo(self, session: SMTPSession, line: str) -> bytes:
+        return self._helo_reply
+
+    def _cmd_mail(self, session: SMTPSession, line: str) -> bytes:
+        session.mail_from = self.extract_address(line)
+        logger.info(orjson.dumps({
+            "event": "mail_from",
+            "session_id": session.session_id,
+            "address": session.mail_from,
+        }).decode())
+        return REPLY_OK
+
+    def _cmd_rcpt(self, session: SMTPSession, line: str) -> bytes:
+        rcpt = self.extract_address(line)
+        session.rcpt_to.append(rcpt)
+        logger.info(orjson.dumps({
+            "event": "rcpt_to",
+            "session_id": session.session_id,
+            "address": rcpt,
+        }).decode())
+        return REPLY_OK
+
+    def _cmd_data(self, session: SMTPSession, line: str) -> bytes:
+        session.in_data = True
+        return REPLY_START_DATA
+
+    def _cmd_rset(self, session: SMTPSession, line: str) -> bytes:
+        session.mail_from = ""
+        session.rcpt_to = []
+        session.message_buf.clear()
+        return REPLY_OK
+
+    def _cmd_noop(self, session: SMTPSession, line: str) -> bytes:
+        return REPLY_OK
+
+    def _cmd_quit(self, session: SMTPSession, line: str) -> bytes:
+        session.closing = True
+        return REPLY_BYE
+
+    def _cmd_vrfy(self, session: SMTPSession, line: str) -> bytes:
+        return REPLY_CANNOT_VRFY
+
+    def _cmd_auth(self, session: SMTPSession, line: str) -> bytes:
+        # Log auth attempt
+        logger.warning(orjson.dumps({
+            "event": "auth_attempt",
+            "session_id": session.session_id,
+            "command": line,
+        }).decode())
+        return REPLY_AUTH_OK
+
     def extract_address(self, line: str) -> str:
         """Extract email address from MAIL/RCPT command"""
         try:
@@ -249,11 +319,13 @@ class SMTPHoneypot:
             pass
         return ""
 
-    def extract_subject(self, message: str) -> str:
+    def extract_subject(self, message: bytes) -> str:
         """Extract subject from message headers"""
-        for line in message.split("\n"):
-            if line.lower().startswith("subject:"):
-                return line[8:].strip()
+        # Stored DATA lines are \n-separated; headers end at the first blank line
+        end = message.find(b"\n\n", 0, MAX_HEADER_SCAN)
+        match = SUBJECT_RE.search(message, 0, end if end != -1 else MAX_HEADER_SCAN)
+        if match:
+            return match.group(1).decode("utf-8", "ignore").strip()
         return ""
 
     def get_metrics(self) -> dict:
@@ -270,15 +342,19 @@ async def main():
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("SMTP_HONEYPOT_PORT", "2525"))
     max_message_size = int(os.getenv("MAX_MESSAGE_SIZE", "1048576"))
+    event_buffer = int(os.getenv("EVENT_BUFFER", "10000"))
 
     honeypot = SMTPHoneypot(
         host=host,
         port=port,
         max_message_size=max_message_size,
+        event_buffer=event_buffer,
     )
 
     await honeypot.start()
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(main())
@@ -5,29 +5,96 @@ Minimal dependencies, optimized for low memory usage
 """
 
 import asyncio
+import functools
 import hashlib
-import json
 import logging
 import os
-import socket
+import secrets
+import signal
 import struct
+import sys
 import time
-from dataclasses import dataclass, asdict
-from datetime import datetime
-from typing import Optional
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # Optional: default asyncio event loop
+    uvloop = None
 
 # Configure logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
 
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s' if LOG_FORMAT != "json" else '%(message)s'
-)
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_LOG_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Renders a record as one JSON object: {"event": <msg>, **<extra= fields>}
+
+    Log sites pass the event name as the message and its fields via extra=,
+    so each record is serialized exactly once, here.
+    """
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        fields = {"event": record.message}
+        for key, value in record.__dict__.items():
+            if key not in _LOG_RECORD_ATTRS:
+                fields[key] = value
+        record.message = orjson.dumps(fields).decode()
+        return super().formatMessage(record)
+
+
+log_handler = logging.StreamHandler()
+if LOG_FORMAT == "json":
+    log_handler.setFormatter(JSONFormatter('%(message)s'))
+else:
+    log_handler.setFormatter(JSONFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logging.basicConfig(level=getattr(logging, LOG_LEVEL), handlers=[log_handler])
 logger = logging.getLogger("ssh-honeypot")
 
+# Unsent bytes above which a write waits for the socket to drain
+DRAIN_THRESHOLD = 64 * 1024
+
+# Ban expiry granularity, in seconds
+BAN_BUCKET_SECONDS = 10
+
+# Bytes fetched from os.urandom() per refill of the cookie/padding pool
+RANDOM_POOL_SIZE = 4096
+
+# Event log spill: queued events waiting for the writer, events per write
+EVENT_QUEUE_SIZE = 10000
+EVENT_BATCH_SIZE = 256
+
+
+# Event timestamps: the "YYYY-MM-DDTHH:MM:SS" part is formatted once per second
+_ts_second = -1
+_ts_prefix = ""
+
+
+def _iso_now() -> str:
+    """Current UTC time as ISO-8601 with microseconds"""
+    global _ts_second, _ts_prefix
+    now_us = time.time_ns() // 1000
+    second, micros = divmod(now_us, 1_000_000)
+    if second != _ts_second:
+        _ts_second = second
+        _ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+    return f"{_ts_prefix}.{micros:06d}"
+
+
+@functools.lru_cache(maxsize=4096)
+def _pw_hash_prefix(password: str) -> str:
+    """Logged password fingerprint; brute-force lists repeat the same passwords"""
+    return hashlib.sha256(password.encode()).hexdigest()[:16]
 
-@dataclass
+
+@dataclass(slots=True)
 class SSHEvent:
     """Represents an SSH interaction event"""
     timestamp: str
@@ -41,7 +108,58 @@ class SSHEvent:
     success: bool = False
 
     def to_json(self) -> str:
-        return json.dumps(asdict(self))
+        # orjson serializes (slotted) dataclasses natively, no asdict() copy
+        return orjson.dumps(self).decode()
+
+    def to_log_json(self) -> str:
+        """JSON for the EVENT_LOG file: the password is stored hashed, like the log lines"""
+        return orjson.dumps({
+            "timestamp": self.timestamp,
+            "event_type": self.event_type,
+            "source_ip": self.source_ip,
+            "source_port": self.source_port,
+            "username": self.username,
+            "password_hash": _pw_hash_prefix(self.password),
+            "command": self.command,
+            "session_id": self.session_id,
+            "success": self.success,
+        }).decode()
+
+
+@dataclass(slots=True)
+class SSHMetrics:
+    """Per-process counters, slotted for cheap increments on the hot path"""
+    total_connections: int = 0
+    active_connections: int = 0
+    failed_logins: int = 0
+    successful_logins: int = 0
+    dropped_events: int = 0
+
+
+class GatedStreamProtocol(asyncio.StreamReaderProtocol):
+    """Stream protocol that rejects banned and over-capacity peers up front
+
+    The check runs synchronously in connection_made, so a rejected
+    connection is closed before any StreamWriter or handler task exists.
+    """
+
+    def __init__(self, honeypot: "SSHHoneypot", limit: int):
+        super().__init__(asyncio.StreamReader(limit=limit), honeypot.handle_connection)
+        self._honeypot = honeypot
+
+    def connection_made(self, transport: asyncio.BaseTransport):
+        honeypot = self._honeypot
+        peer = transport.get_extra_info("peername")
+        if (
+            honeypot.is_banned(peer[0])
+            or honeypot.metrics.active_connections >= honeypot.max_connections
+        ):
+            transport.close()
+            return
+
+        # Released by handle_connection when the session ends
+        honeypot.metrics.active_connections += 1
+        super().connection_made(transport)
 
 
 class SSHHoneypot:
@@ -50,6 +168,7 @@ class SSHHoneypot:
     # SSH protocol constants
     SSH_MSG_KEXINIT = 20
     SSH_MSG_USERAUTH_REQUEST = 50
+    SSH_MSG_USERAUTH_FAILURE = 51
     SSH_MSG_CHANNEL_REQUEST = 98
 
     def __init__(
@@ -58,77 +177,153 @@ class SSHHoneypot:
         port: int = 2222,
         max_connections: int = 50,
         ban_time: int = 300,
+        event_buffer: int = 10000,
+        event_log: Optional[str] = None,
+        reuse_port: bool = False,
     ):
         self.host = host
         self.port = port
+        self.reuse_port = reuse_port
         self.max_connections = max_connections
         self.ban_time = ban_time
-        self.active_connections = 0
-        self.banned_ips: dict = {}
-        self.events: list = []
+        self.banned_ips: set = set()
+
+        # Ban expiry wheel: one set of IPs per BAN_BUCKET_SECONDS slot. Rotating
+        # onto a slot unbans its whole bucket; a ban lasts ban_time..ban_time+bucket.
+        self._ban_wheel = [set() for _ in range(-(-ban_time // BAN_BUCKET_SECONDS) + 1)]
+        self._ban_slot = 0
+        self.events: Deque[SSHEvent] = deque(maxlen=event_buffer)
+
+        # Optional JSONL record of every event (password hashed), appended by
+        # a background task
+        self.event_log = event_log
+        self._event_queue: Optional[asyncio.Queue] = (
+            asyncio.Queue(maxsize=EVENT_QUEUE_SIZE) if event_log else None
+        )
+        self._event_writer_task: Optional[asyncio.Task] = None
+        self._ban_wheel_task: Optional[asyncio.Task] = None
 
         # SSH server identification
         self.server_version = b"SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.1\r\n"
 
+        # Cookies and padding are sliced from one os.urandom() pool that is
+        # refilled in RANDOM_POOL_SIZE chunks, not a syscall per packet
+        self._rand_pool = b""
+        self._rand_offset = 0
+
+        # Constant packet layouts, framed once; per packet only the KEXINIT
+        # cookie and the random padding are filled in
+        kex_algo_block = self._build_kex_algo_block()
+        header, self._kex_padding_len = self._frame_header(1 + 16 + len(kex_algo_block))
+        self._kex_head = header + bytes([self.SSH_MSG_KEXINIT])  # up to the cookie
+        self._kex_tail = kex_algo_block  # after the cookie
+
+        auth_failure_payload = b"".join((
+            bytes([self.SSH_MSG_USERAUTH_FAILURE]),
+            struct.pack(">I", 17),
+            b"password,keyboard",
+            b"\x00",  # partial success = false
+        ))
+        header, self._auth_failure_padding_len = self._frame_header(len(auth_failure_payload))
+        self._auth_failure_prefix = header + auth_failure_payload
+
         # Metrics
-        self.total_connections = 0
-        self.failed_logins = 0
-        self.successful_logins = 0
+        self.metrics = SSHMetrics()
 
     async def start(self):
         """Start the SSH honeypot server"""
-        server = await asyncio.start_server(
-            self.handle_connection,
+        loop = asyncio.get_running_loop()
+
+        # Open the event log before listening, so a bad EVENT_LOG path
+        # stops the server here instead of killing the writer task later
+        event_log_fd = None
+        if self._event_queue is not None:
+            event_log_fd = os.open(self.event_log, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+        server = await loop.create_server(
+            lambda: GatedStreamProtocol(self, limit=1024 * 64),  # 64KB buffer limit
             self.host,
             self.port,
-            limit=1024 * 64,  # 64KB buffer limit for memory efficiency
+            # Keep the kernel accept queue small so floods are shed by the OS.
+            # SO_REUSEPORT only when ACCEPT_WORKERS processes share the port;
+            # a lone instance should fail on a port that is already taken.
+            backlog=min(self.max_connections, 128),
+            reuse_port=self.reuse_port,
         )
 
         addr = server.sockets[0].getsockname()
-        logger.info(json.dumps({
-            "event": "server_started",
+        logger.info("server_started", extra={
             "host": addr[0],
             "port": addr[1],
             "max_connections": self.max_connections,
-        }))
+            "pid": os.getpid(),
+        })
+
+        self._ban_wheel_task = asyncio.create_task(self._rotate_ban_wheel())
+        if event_log_fd is not None:
+            self._event_writer_task = asyncio.create_task(self._event_writer(event_log_fd))
 
         async with server:
             await server.serve_forever()
 
+    async def _rotate_ban_wheel(self):
+        """Advance the ban wheel one slot per bucket, expiring that slot's bans"""
+        while True:
+            await asyncio.sleep(BAN_BUCKET_SECONDS)
+            self._ban_slot = (self._ban_slot + 1) % len(self._ban_wheel)
+            expired = self._ban_wheel[self._ban_slot]
+            self.banned_ips -= expired
+            expired.clear()
+
+    async def _event_writer(self, fd: int):
+        """Append queued events to the JSONL event log, a batch per write
+
+        The blocking os.write() runs in the default executor so a slow disk
+        does not stall the event loop; a failed write drops that batch.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                batch = [await self._event_queue.get()]
+                while len(batch) < EVENT_BATCH_SIZE and not self._event_queue.empty():
+                    batch.append(self._event_queue.get_nowait())
+                data = "".join(f"{event.to_log_json()}\n" for event in batch).encode()
+                try:
+                    await loop.run_in_executor(None, os.write, fd, data)
+                except OSError as e:
+                    self.metrics.dropped_events += len(batch)
+                    logger.error("event_log_error", extra={
+                        "path": self.event_log,
+                        "error": str(e),
+                        "dropped": len(batch),
+                    })
+        finally:
+            os.close(fd)
+
     async def handle_connection(
         self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
     ):
-        """Handle incoming SSH connection"""
+        """Handle incoming SSH connection (admitted by GatedStreamProtocol)"""
         addr = writer.get_extra_info("peername")
         client_ip, client_port = addr[0], addr[1]
 
-        # Check if IP is banned
-        if self.is_banned(client_ip):
-            writer.close()
-            await writer.wait_closed()
-            return
-
-        # Check connection limit
-        if self.active_connections >= self.max_connections:
-            writer.close()
-            await writer.wait_closed()
-            return
-
-        self.active_connections += 1
-        self.total_connections += 1
+        metrics = self.metrics
+        metrics.total_connections += 1
         session_id = self.generate_session_id(client_ip, client_port)
 
-        logger.info(json.dumps({
-            "event": "connection_opened",
-            "session_id": session_id,
-            "source_ip": client_ip,
-            "source_port": client_port,
-        }))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("connection_opened", extra={
+                "session_id": session_id,
+                "source_ip": client_ip,
+                "source_port": client_port,
+            })
 
         try:
-            # Send server version
-            writer.write(self.server_version)
-            await writer.drain()
+            # Send server version and KEXINIT together; RFC 4253 lets key
+            # exchange start right after our identification string
+            writer.write(self.server_version + self.build_kexinit())
+            if writer.transport.get_write_buffer_size() > DRAIN_THRESHOLD:
+                await writer.drain()
 
             # Receive client version
             client_version = await asyncio.wait_for(
@@ -136,43 +331,42 @@ class SSHHoneypot:
             )
             client_version = client_version.decode("utf-8", errors="ignore").strip()
 
-            logger.info(json.dumps({
-                "event": "client_version",
-                "session_id": session_id,
-                "version": client_version,
-            }))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("client_version", extra={
+                    "session_id": session_id,
+                    "version": client_version,
+                })
 
             # Simulate SSH handshake
             await self.simulate_handshake(reader, writer, session_id, client_ip, client_port)
 
         except asyncio.TimeoutError:
-            logger.debug(json.dumps({
-                "event": "timeout",
-                "session_id": session_id,
-            }))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("timeout", extra={
+                    "session_id": session_id,
+                })
         except ConnectionResetError:
-            logger.debug(json.dumps({
-                "event": "connection_reset",
-                "session_id": session_id,
-            }))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("connection_reset", extra={
+                    "session_id": session_id,
+                })
         except Exception as e:
-            logger.error(json.dumps({
-                "event": "error",
+            logger.error("error", extra={
                 "session_id": session_id,
                 "error": str(e),
-            }))
+            })
         finally:
-            self.active_connections -= 1
+            metrics.active_connections -= 1
             writer.close()
             try:
                 await writer.wait_closed()
             except Exception:
                 pass
 
-            logger.info(json.dumps({
-                "event": "connection_closed",
-                "session_id": session_id,
-            }))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("connection_closed", extra={
+                    "session_id": session_id,
+                })
 
     async def simulate_handshake(
         self,
@@ -182,12 +376,7 @@ class SSHHoneypot:
         client_ip: str,
         client_port: int,
     ):
-        """Simulate SSH key exchange and authentication"""
-        # Send key exchange init
-        kexinit = self.build_kexinit()
-        writer.write(kexinit)
-        await writer.drain()
-
+        """Simulate SSH key exchange and authentication (KEXINIT already sent)"""
         # Wait for auth attempts
         login_attempts = 0
         max_attempts = 3
@@ -204,7 +393,7 @@ class SSHHoneypot:
                     username, password = auth_info
 
                     event = SSHEvent(
-                        timestamp=datetime.utcnow().isoformat(),
+                        timestamp=_iso_now(),
                         event_type="ssh_login_attempt",
                         source_ip=client_ip,
                         source_port=client_port,
@@ -214,21 +403,26 @@ class SSHHoneypot:
                         success=False,
                     )
 
-                    logger.warning(json.dumps({
-                        "event": "login_attempt",
+                    logger.warning("login_attempt", extra={
                         "session_id": session_id,
                         "username": username,
-                        "password_hash": hashlib.sha256(password.encode()).hexdigest()[:16],
+                        "password_hash": _pw_hash_prefix(password),
                         "attempt": login_attempts + 1,
-                    }))
+                    })
 
                     self.events.append(event)
-                    self.failed_logins += 1
+                    if self._event_queue is not None:
+                        try:
+                            self._event_queue.put_nowait(event)
+                        except asyncio.QueueFull:
+                            self.metrics.dropped_events += 1
+                    self.metrics.failed_logins += 1
                     login_attempts += 1
 
                     # Send auth failure
                     writer.write(self.build_auth_failure())
-                    await writer.drain()
+                    if writer.transport.get_write_buffer_size() > DRAIN_THRESHOLD:
+                        await writer.drain()
 
             except asyncio.TimeoutError:
                 break
@@ -237,10 +431,9 @@ class SSHHoneypot:
         if login_attempts >= max_attempts:
             self.ban_ip(client_ip)
 
-    def build_kexinit(self) -> bytes:
-        """Build SSH_MSG_KEXINIT packet"""
+    def _build_kex_algo_block(self) -> bytes:
+        """Constant KEXINIT payload after the cookie (name-lists, flags)"""
         # Simplified KEXINIT message
-        cookie = os.urandom(16)
         kex_algorithms = b"curve25519-sha256,ecdh-sha2-nistp256"
         host_key_algorithms = b"ssh-ed25519,ssh-rsa"
         encryption = b"aes256-ctr,aes128-ctr"
@@ -248,112 +441,119 @@ class SSHHoneypot:
         compression = b"none"
         languages = b""
 
-        payload = bytearray()
-        payload.append(self.SSH_MSG_KEXINIT)
-        payload.extend(cookie)
-
+        block = bytearray()
         for algo in [kex_algorithms, host_key_algorithms, encryption, encryption, mac, mac, compression, compression, languages, languages]:
-            payload.extend(struct.pack(">I", len(algo)))
-            payload.extend(algo)
+            block.extend(struct.pack(">I", len(algo)))
+            block.extend(algo)
 
-        payload.extend(b"\x00")  # first_kex_packet_follows
-        payload.extend(b"\x00\x00\x00\x00")  # reserved
+        block.extend(b"\x00")  # first_kex_packet_follows
+        block.extend(b"\x00\x00\x00\x00")  # reserved
+        return bytes(block)
 
-        # Wrap in packet
-        packet_len = len(payload) + 1  # +1 for padding length
+    @staticmethod
+    def _frame_header(payload_len: int) -> tuple:
+        """packet_length/padding_length header and padding size for a payload"""
+        packet_len = payload_len + 1  # +1 for padding length
         padding_len = 8 - ((packet_len + 4) % 8)
         if padding_len < 4:
             padding_len += 8
+        return struct.pack(">IB", packet_len + padding_len, padding_len), padding_len
 
-        result = struct.pack(">I", packet_len + padding_len)
-        result += struct.pack("B", padding_len)
-        result += bytes(payload)
-        result += os.urandom(padding_len)
-
-        return result
+    def build_kexinit(self) -> bytes:
+        """Build SSH_MSG_KEXINIT packet"""
+        # Cookie and padding from one draw on the random pool
+        random_bytes = self._random_bytes(16 + self._kex_padding_len)
+        return b"".join((self._kex_head, random_bytes[:16], self._kex_tail, random_bytes[16:]))
 
     def build_auth_failure(self) -> bytes:
         """Build SSH authentication failure response"""
-        # SSH_MSG_USERAUTH_FAILURE
-        payload = bytearray()
-        payload.append(51)  # SSH_MSG_USERAUTH_FAILURE
-        payload.extend(struct.pack(">I", 17))
-        payload.extend(b"password,keyboard")
-        payload.append(0)  # partial success = false
-
-        packet_len = len(payload) + 1
-        padding_len = 8 - ((packet_len + 4) % 8)
-        if padding_len < 4:
-            padding_len += 8
-
-        result = struct.pack(">I", packet_len + padding_len)
-        result += struct.pack("B", padding_len)
-        result += bytes(payload)
-        result += os.urandom(padding_len)
+        return self._auth_failure_prefix + self._random_bytes(self._auth_failure_padding_len)
 
-        return result
+    def _random_bytes(self, n: int) -> bytes:
+        """n bytes from the pooled os.urandom() buffer"""
+        offset = self._rand_offset
+        if offset + n > len(self._rand_pool):
+            self._rand_pool = os.urandom(max(RANDOM_POOL_SIZE, n))
+            offset = 0
+        self._rand_offset = offset + n
+        return self._rand_pool[offset:offset + n]
 
     def parse_auth_packet(self, data: bytes) -> Optional[tuple]:
         """Extract username and password from auth packet"""
-        try:
-            # Look for username pattern in raw data
-            # This is a simplified parser - real implementation would be more complex
-            text = data.decode("utf-8", errors="ignore")
-
-            # Simple heuristic: look for null-separated strings
-            parts = text.split("\x00")
-            username = ""
-            password = ""
-
-            for i, part in enumerate(parts):
-                if part and len(part) < 64:
-                    if not username and part.isalnum():
-                        username = part
-                    elif username and not password:
-                        password = part
-
-            if username:
-                return (username, password)
+        # Look for username pattern in raw data
+        # This is a simplified parser - real implementation would be more complex
+
+        # Simple heuristic: look for null-separated strings. Scans the raw
+        # bytes by offset and decodes fields one at a time; as with decoding
+        # the whole packet, invalid UTF-8 bytes are dropped from a field.
+        username = ""
+        password = ""
+
+        size = len(data)
+        start = 0
+        while True:
+            stop = data.find(b"\x00", start)
+            if stop == -1:
+                stop = size
+            if stop > start:
+                part = data[start:stop]
+                if part.isascii():
+                    # Plain ASCII: skip decoding fields too long to qualify
+                    text = part.decode("ascii") if len(part) < 64 else ""
+                else:
+                    text = part.decode("utf-8", errors="ignore")
+                if 0 < len(text) < 64:
+                    if not username and text.isalnum():
+                        username = text
+                    elif username:
+                        password = text
+                        break
+            if stop == size:
+                break
+            start = stop + 1
 
-        except Exception:
-            pass
+        if username:
+            # Floods repeat a handful of usernames, so share one str per name
+            return (sys.intern(username), password)
 
         return None
 
     def generate_session_id(self, ip: str, port: int) -> str:
         """Generate unique session ID"""
-        data = f"{ip}:{port}:{time.time()}"
-        return hashlib.sha256(data.encode()).hexdigest()[:16]
+        # Opaque 64-bit tag; the peer address is logged alongside it
+        return secrets.token_hex(8)
 
     def is_banned(self, ip: str) -> bool:
         """Check if IP is currently banned"""
-        if ip in self.banned_ips:
-            if time.time() < self.banned_ips[ip]:
-                return True
-            del self.banned_ips[ip]
-        return False
+        return ip in self.banned_ips
 
     def ban_ip(self, ip: str):
         """Ban an IP address"""
-        self.banned_ips[ip] = time.time() + self.ban_time
-        logger.warning(json.dumps({
-            "event": "ip_banned",
+        if ip in self.banned_ips:
+            # Re-ban: restart the ban from the current slot
+            for bucket in self._ban_wheel:
+                bucket.discard(ip)
+        self._ban_wheel[self._ban_slot].add(ip)
+        self.banned_ips.add(ip)
+        logger.warning("ip_banned", extra={
             "ip": ip,
             "duration": self.ban_time,
-        }))
+        })
 
     def get_metrics(self) -> dict:
         """Return current metrics"""
+        metrics = self.metrics
         return {
-            "total_connections": self.total_connections,
-            "active_connections": self.active_connections,
-            "failed_logins": self.failed_logins,
-            "successful_logins": self.successful_logins,
+            "total_connections": metrics.total_connections,
+            "active_connections": metrics.active_connections,
+            "failed_logins": metrics.failed_logins,
+            "successful_logins": metrics.successful_logins,
             "banned_ips": len(self.banned_ips),
+            "dropped_events": metrics.dropped_events,
         }
 
 
-async def main():
+async def main(reuse_port: bool = False):
     """Main entry point"""
     host = os.getenv("HOST", "0.0.0.0")
     # Use PORT env var, avoiding K8s service injection conflicts
@@ -365,16 +565,81 @@ async def main():
         port = int(port_str)
     max_connections = int(os.getenv("MAX_CONNECTIONS", "50"))
     ban_time = int(os.getenv("BAN_TIME", "300"))
+    event_buffer = int(os.getenv("EVENT_BUFFER", "10000"))
+    event_log = os.getenv("EVENT_LOG") or None
 
     honeypot = SSHHoneypot(
         host=host,
         port=port,
         max_connections=max_connections,
         ban_time=ban_time,
+        event_buffer=event_buffer,
+        event_log=event_log,
+        reuse_port=reuse_port,
     )
 
     await honeypot.start()
 
 
+def run_worker(reuse_port: bool = False):
+    """Run one honeypot process"""
+    if uvloop is not None:
+        uvloop.install()
+    asyncio.run(main(reuse_port=reuse_port))
+
+
+def supervise_workers(accept_workers: int):
+    """Fork accept workers sharing the port and wait on them
+
+    If any worker exits, the others are stopped and the supervisor exits
+    non-zero so the pod gets restarted. SIGTERM/SIGINT are passed on to the
+    workers.
+    """
+    workers = set()
+    stopping = False
+    for _ in range(accept_workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(reuse_port=True)
+            finally:
+                os._exit(1)
+        workers.add(pid)
+
+    def stop_workers(signum=signal.SIGTERM, frame=None):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    signal.signal(signal.SIGINT, stop_workers)
+
+    pid, status = os.wait()
+    workers.discard(pid)
+    if stopping:
+        exit_code = 0
+    else:
+        exit_code = 1
+        logger.error("worker_exited", extra={
+            "pid": pid,
+            "exit_code": os.waitstatus_to_exitcode(status),
+        })
+        stop_workers()
+    for pid in workers:
+        os.waitpid(pid, 0)
+    sys.exit(exit_code)
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    # With ACCEPT_WORKERS > 1, worker processes bind the same port
+    # (SO_REUSEPORT) and the kernel spreads accepts across them. Bans and
+    # metrics are per process, so a banned IP can still reach other workers.
+    accept_workers = int(os.getenv("ACCEPT_WORKERS", "1"))
+    if accept_workers > 1:
+        supervise_workers(accept_workers)
+    else:
+        run_worker()